@@ -1,34 +1,120 @@
 import streamlit as st
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 from utils import get_policy_recommendations_enhanced, calculate_risk_score
+from llm_backends import TransformersPipeline, load_llama_cpp_pipeline
+import numpy as np
 import os
+import threading
+import time
+from collections import OrderedDict
+
+# Text-generation backend: "llama_cpp" (GGUF, CPU optimized) or "transformers"
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "llama_cpp").lower()
+
+# Weight quantization for TinyLlama: "nf4" (4-bit bitsandbytes) or "none" (16-bit weights)
+QUANT_MODE = os.environ.get("QUANT_MODE", "nf4").lower()
+
+# Compile the transformers forward pass for the short fixed-shape decodes this app runs.
+# Compiled generations share one static KV cache on the model, so sessions decode one at a
+# time; TORCH_COMPILE=0 runs eager generate() calls concurrently on per-call caches
+TORCH_COMPILE = os.environ.get("TORCH_COMPILE", "1") == "1"
+
+# Static system prompts shared by every request; their KV state is computed once at load time
+REASONING_SYSTEM_PROMPT = """<|system|>
+You are an expert Indian insurance advisor. Provide clear, concise advice.
+
+"""
+
+FAQ_SYSTEM_PROMPT = """<|system|>
+You are a helpful Indian insurance expert. Answer questions clearly and concisely in 2-3 sentences. Focus on practical advice for Indian customers.
+
+"""
+
+def load_quantized_model(model_name: str):
+    """Load the causal LM with INT4 weight-only quantization, falling back to full precision"""
+    import torch
+    from transformers import AutoModelForCausalLM
+    
+    # bfloat16 on CPU-only hosts and bf16-capable GPUs avoids FP16 overflow in softmax
+    if not torch.cuda.is_available() or torch.cuda.is_bf16_supported():
+        compute_dtype = torch.bfloat16
+    else:
+        compute_dtype = torch.float16
+    
+    if QUANT_MODE == "nf4":
+        try:
+            from transformers import BitsAndBytesConfig
+            
+            quantization_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=compute_dtype,
+                bnb_4bit_quant_type="nf4"
+            )
+            return AutoModelForCausalLM.from_pretrained(
+                model_name,
+                device_map="auto",
+                quantization_config=quantization_config,
+                attn_implementation="sdpa",
+                low_cpu_mem_usage=True
+            )
+        except Exception as e:
+            st.warning(f"⚠️ 4-bit quantization unavailable, loading full precision model: {str(e)}")
+    
+    return AutoModelForCausalLM.from_pretrained(
+        model_name,
+        device_map="auto",
+        torch_dtype=compute_dtype,
+        attn_implementation="sdpa",
+        low_cpu_mem_usage=True
+    )
+
+def load_transformers_pipeline():
+    """Load TinyLlama on the Hugging Face transformers backend"""
+    from transformers import AutoTokenizer
+    
+    model_name = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    
+    # Add padding token if not present
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    
+    model = load_quantized_model(model_name)
+    # Set explicitly so generate() doesn't warn and fall back on every call
+    model.generation_config.pad_token_id = tokenizer.eos_token_id
+    
+    llm_pipeline = TransformersPipeline(model, tokenizer)
+    
+    # Streaming and non-streaming calls both run generate(), so both use the compiled forward
+    if TORCH_COMPILE:
+        try:
+            llm_pipeline.compile()
+        except Exception as e:
+            st.warning(f"⚠️ Model compilation unavailable, using eager mode: {str(e)}")
+    
+    return llm_pipeline
 
 # Load TinyLlama Model & Tokenizer with error handling
 @st.cache_resource
 def load_tinyllama_pipeline():
     """Load TinyLlama model with proper error handling"""
     try:
-        model_name = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
-        
         with st.spinner("🤖 Loading AI model... This may take a moment..."):
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            llm_pipeline = None
+            if LLM_BACKEND == "llama_cpp":
+                try:
+                    llm_pipeline = load_llama_cpp_pipeline()
+                except Exception as e:
+                    st.warning(f"⚠️ llama.cpp backend unavailable, falling back to transformers: {str(e)}")
             
-            # Add padding token if not present
-            if tokenizer.pad_token is None:
-                tokenizer.pad_token = tokenizer.eos_token
+            if llm_pipeline is None:
+                llm_pipeline = load_transformers_pipeline()
             
-            model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                device_map="auto",
-                torch_dtype="auto"
-            )
-            
-            llm_pipeline = pipeline(
-                "text-generation", 
-                model=model, 
-                tokenizer=tokenizer,
-                return_full_text=False
-            )
+            try:
+                for system_prompt in (REASONING_SYSTEM_PROMPT, FAQ_SYSTEM_PROMPT):
+                    llm_pipeline.cache_prefix(system_prompt)
+            except Exception as e:
+                st.warning(f"⚠️ Prompt prefix caching disabled: {str(e)}")
             
         return llm_pipeline
         
@@ -37,13 +123,92 @@ def load_tinyllama_pipeline():
         st.info("💡 The app will continue with basic recommendations without AI reasoning.")
         return None
 
-# Load the model only once
-llm_pipeline = load_tinyllama_pipeline()
+def _normalize(text: str) -> str:
+    """Normalize free text so equivalent questions and goals share a cache key"""
+    return " ".join(text.lower().split())
+
+class _TextCache:
+    """Bounded store of generated text whose entries expire after ttl seconds.
+
+    Streaming callers look a key up before generating and store the streamed text
+    afterwards, which a cached function call cannot express.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, text: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+# One store per kind of generated text, shared by every session
+@st.cache_resource(show_spinner=False)
+def _text_cache(kind: str) -> _TextCache:
+    return _TextCache()
+
+# Stop at the next chat turn marker or a run of blank lines instead of running to max_new_tokens
+STOP_SEQUENCES = ("<|user|>", "\n\n\n")
+
+# "2-3 sentences" is typically 40-60 tokens
+REASONING_GENERATION_KWARGS = {
+    "max_new_tokens": 60,
+    "do_sample": False,
+    "num_beams": 1,
+    "repetition_penalty": 1.1,
+    "stop": STOP_SEQUENCES
+}
+
+def _reasoning_prompt(age: int, income: float, health: str, goal: str, recommended_policy: dict, risk_score: float) -> str:
+    """Build the chat prompt asking the LLM to justify a recommended policy"""
+    return f"""{REASONING_SYSTEM_PROMPT}<|user|>
+Customer Profile:
+- Age: {age} years
+- Annual Income: ₹{income} LPA  
+- Health: {health}
+- Goal: {goal}
+- Risk Score: {risk_score}/10
+
+Recommended Policy: {recommended_policy.get('Policy_Type')} with ₹{recommended_policy.get('Coverage_Lakhs')} lakhs coverage for ₹{recommended_policy.get('Premium_INR')} premium.
+
+Explain in 2-3 sentences why this policy is suitable. Focus on benefits and value.
+
+<|assistant|>"""
+
+def _reasoning_cache_key(age: int, income: float, health: str, goal: str, recommended_policy: dict, risk_score: float) -> tuple:
+    """Bucket income to the nearest lakh and risk to 0.5 so similar profiles share a cache entry.
+
+    Only the key is bucketed; prompts are built from the profile's real values.
+    """
+    return (
+        age, round(income), health, _normalize(goal),
+        recommended_policy.get('Policy_Type'),
+        recommended_policy.get('Coverage_Lakhs'),
+        recommended_policy.get('Premium_INR'),
+        round(risk_score * 2) / 2
+    )
 
 def generate_llm_reasoning(age: int, income: float, health: str, goal: str, recommended_policy: dict, risk_score: float) -> str:
     """Generate AI-powered reasoning for policy recommendation"""
     
-    if llm_pipeline is None:
+    # The model is loaded on first use so pages without AI features start faster
+    if load_tinyllama_pipeline() is None:
         return f"""
         Based on your profile analysis:
         
@@ -57,35 +222,15 @@ def generate_llm_reasoning(age: int, income: float, health: str, goal: str, reco
         """
     
     try:
-        prompt = f"""<|system|>
-You are an expert Indian insurance advisor. Provide clear, concise advice.
-
-<|user|>
-Customer Profile:
-- Age: {age} years
-- Annual Income: ₹{income} LPA  
-- Health: {health}
-- Goal: {goal}
-- Risk Score: {risk_score}/10
-
-Recommended Policy: {recommended_policy.get('Policy_Type')} with ₹{recommended_policy.get('Coverage_Lakhs')} lakhs coverage for ₹{recommended_policy.get('Premium_INR')} premium.
-
-Explain in 2-3 sentences why this policy is suitable. Focus on benefits and value.
-
-<|assistant|>"""
-
-        with st.spinner("🤖 AI is analyzing your profile..."):
-            output = llm_pipeline(
-                prompt,
-                max_new_tokens=100,
-                do_sample=True,
-                temperature=0.7,
-                top_k=50,
-                top_p=0.9,
-                repetition_penalty=1.1
-            )
-        
-        reasoning = output[0]['generated_text'].strip()
+        key = _reasoning_cache_key(age, income, health, goal, recommended_policy, risk_score)
+        reasoning = _text_cache("reasoning").get(key)
+        if reasoning is None:
+            with st.spinner("🤖 AI is analyzing your profile..."):
+                prompt = _reasoning_prompt(age, income, health, goal, recommended_policy, risk_score)
+                output = load_tinyllama_pipeline()(prompt, **REASONING_GENERATION_KWARGS)
+                reasoning = output[0]['generated_text'].strip()
+            if reasoning:
+                _text_cache("reasoning").set(key, reasoning)
         
         # Clean up the response
         if reasoning:
@@ -101,8 +246,48 @@ Explain in 2-3 sentences why this policy is suitable. Focus on benefits and valu
         health status ({health}), and financial profile (₹{income} LPA income).
         """
 
-def get_policy_recommendation_with_ai(age: int, income: float, health: str, goal: str) -> dict:
-    """Get policy recommendation with AI reasoning"""
+def stream_llm_reasoning(age: int, income: float, health: str, goal: str, recommended_policy: dict, risk_score: float):
+    """Yield AI-powered reasoning for a recommendation as the model generates it"""
+    
+    llm_pipeline = load_tinyllama_pipeline()
+    if llm_pipeline is None:
+        yield generate_llm_reasoning(age, income, health, goal, recommended_policy, risk_score)
+        return
+    
+    key = _reasoning_cache_key(age, income, health, goal, recommended_policy, risk_score)
+    reasoning = _text_cache("reasoning").get(key)
+    if reasoning is not None:
+        yield f"🤖 **AI Analysis:** {reasoning}"
+        return
+    
+    try:
+        yield "🤖 **AI Analysis:** "
+        prompt = _reasoning_prompt(age, income, health, goal, recommended_policy, risk_score)
+        chunks = []
+        for chunk in llm_pipeline.stream(prompt, **REASONING_GENERATION_KWARGS):
+            chunks.append(chunk)
+            yield chunk
+        
+        reasoning = "".join(chunks).strip()
+        if reasoning:
+            _text_cache("reasoning").set(key, reasoning)
+        else:
+            yield "AI analysis completed. This policy matches your profile requirements."
+            
+    except Exception as e:
+        yield f"""
+        **Profile Analysis:**
+        This {recommended_policy.get('Policy_Type')} policy is recommended based on your age ({age}), 
+        health status ({health}), and financial profile (₹{income} LPA income).
+        
+        ⚠️ AI reasoning temporarily unavailable: {str(e)}
+        """
+
+def get_policy_recommendation_with_ai(age: int, income: float, health: str, goal: str, include_reasoning: bool = True) -> dict:
+    """Get policy recommendation with AI reasoning.
+
+    Callers that stream the reasoning with stream_llm_reasoning() pass include_reasoning=False.
+    """
     
     # Get enhanced recommendations
     recommendation_data = get_policy_recommendations_enhanced(age, income, health, goal)
@@ -113,82 +298,122 @@ def get_policy_recommendation_with_ai(age: int, income: float, health: str, goal
     best_policy = recommendation_data["best_policy"]
     
     # Generate AI reasoning
-    ai_reasoning = generate_llm_reasoning(
-        age, income, health, goal, 
-        best_policy, recommendation_data["risk_score"]
-    )
+    if include_reasoning:
+        recommendation_data["ai_reasoning"] = generate_llm_reasoning(
+            age, income, health, goal, 
+            best_policy, recommendation_data["risk_score"]
+        )
     
-    recommendation_data["ai_reasoning"] = ai_reasoning
+    # Plain records for the comparison table and PDF report, so they skip per-row pandas access
+    recommendation_data["top_policies_records"] = [
+        {
+            "Policy_Type": policy.Policy_Type,
+            "Coverage_Lakhs": int(policy.Coverage_Lakhs),
+            "Premium_INR": int(policy.Premium_INR),
+            "Age": int(policy.Age),
+            "Value_Score": policy.Coverage_Lakhs / (policy.Premium_INR / 1000)
+        }
+        for policy in recommendation_data["top_policies"].itertuples(index=False)
+    ]
     
     return recommendation_data
 
+FAQ_GENERATION_KWARGS = {
+    "max_new_tokens": 50,
+    "do_sample": True,
+    "temperature": 0.3,
+    "top_k": 0,
+    "top_p": 1.0,
+    "repetition_penalty": 1.1,
+    "stop": STOP_SEQUENCES
+}
+
+def _faq_prompt(question: str) -> str:
+    """Build the chat prompt for a free-form insurance question"""
+    return f"""{FAQ_SYSTEM_PROMPT}<|user|>
+{question}
+
+<|assistant|>"""
+
 def answer_insurance_question(question: str) -> str:
     """Answer insurance-related questions using AI"""
     
-    if llm_pipeline is None:
+    if load_tinyllama_pipeline() is None:
         return "❌ AI assistant is currently unavailable. Please try again later or contact our support team."
     
     if not question.strip():
         return "❓ Please ask a specific insurance-related question."
     
     try:
-        prompt = f"""<|system|>
-You are a helpful Indian insurance expert. Answer questions clearly and concisely in 2-3 sentences. Focus on practical advice for Indian customers.
-
-<|user|>
-{question}
-
-<|assistant|>"""
-
-        with st.spinner("🤖 AI is thinking..."):
-            output = llm_pipeline(
-                prompt,
-                max_new_tokens=80,
-                do_sample=True,
-                temperature=0.6,
-                top_k=40,
-                top_p=0.8,
-                repetition_penalty=1.1
-            )
+        key = _normalize(question)
+        answer = _text_cache("faq").get(key)
+        if answer is None:
+            with st.spinner("🤖 AI is thinking..."):
+                output = load_tinyllama_pipeline()(_faq_prompt(question.strip()), **FAQ_GENERATION_KWARGS)
+                answer = output[0]['generated_text'].strip()
+            if answer:
+                _text_cache("faq").set(key, answer)
         
-        answer = output[0]['generated_text'].strip()
         return answer if answer else "I'd be happy to help with your insurance question. Could you please be more specific?"
         
     except Exception as e:
         return f"⚠️ Sorry, I'm having trouble processing your question right now. Error: {str(e)}"
 
+def stream_insurance_answer(question: str):
+    """Yield the answer to an insurance-related question as the model generates it"""
+    
+    llm_pipeline = load_tinyllama_pipeline()
+    if llm_pipeline is None or not question.strip():
+        yield answer_insurance_question(question)
+        return
+    
+    key = _normalize(question)
+    answer = _text_cache("faq").get(key)
+    if answer is not None:
+        yield answer
+        return
+    
+    try:
+        chunks = []
+        for chunk in llm_pipeline.stream(_faq_prompt(question.strip()), **FAQ_GENERATION_KWARGS):
+            chunks.append(chunk)
+            yield chunk
+        
+        answer = "".join(chunks).strip()
+        if answer:
+            _text_cache("faq").set(key, answer)
+        else:
+            yield "I'd be happy to help with your insurance question. Could you please be more specific?"
+            
+    except Exception as e:
+        yield f"⚠️ Sorry, I'm having trouble processing your question right now. Error: {str(e)}"
+
+# Premium rating tables shared by the scalar and vectorized estimators
+_BASE_RATES = {
+    "Term Life": 0.5,      # ₹500 per lakh per year
+    "Health": 0.8,         # ₹800 per lakh per year  
+    "Comprehensive": 1.2,  # ₹1200 per lakh per year
+    "Accident Cover": 0.3  # ₹300 per lakh per year
+}
+_AGE_BINS = np.array([25, 35, 45, 55])
+_AGE_MULT = np.array([0.8, 1.0, 1.3, 1.7, 2.5])
+_HEALTH_MULT = {"Good": 1.0, "Average": 1.3, "Poor": 2.0}
+
 def calculate_premium_estimate(age: int, coverage_lakhs: int, policy_type: str, health: str) -> dict:
     """Calculate estimated premium based on various factors"""
     
-    base_rates = {
-        "Term Life": 0.5,      # ₹500 per lakh per year
-        "Health": 0.8,         # ₹800 per lakh per year  
-        "Comprehensive": 1.2,  # ₹1200 per lakh per year
-        "Accident Cover": 0.3  # ₹300 per lakh per year
-    }
+    base_rate = _BASE_RATES.get(policy_type, 0.8)
     
-    base_rate = base_rates.get(policy_type, 0.8)
-    
-    # Age multiplier
-    if age < 25:
-        age_multiplier = 0.8
-    elif age < 35:
-        age_multiplier = 1.0
-    elif age < 45:
-        age_multiplier = 1.3
-    elif age < 55:
-        age_multiplier = 1.7
-    else:
-        age_multiplier = 2.5
+    # Age multiplier: bins are lower bounds, so an age equal to a bin edge falls in the upper band
+    age_multiplier = float(_AGE_MULT[np.searchsorted(_AGE_BINS, age, side="right")])
     
-    # Health multiplier
-    health_multiplier = {"Good": 1.0, "Average": 1.3, "Poor": 2.0}
+    health_multiplier = _HEALTH_MULT.get(health, 1.0)
     
     estimated_premium = (
         coverage_lakhs * 
         base_rate * 
         age_multiplier * 
-        health_multiplier.get(health, 1.0) * 
+        health_multiplier * 
         1000  # Convert to rupees
     )
     
@@ -196,5 +421,20 @@ def calculate_premium_estimate(age: int, coverage_lakhs: int, policy_type: str,
         "estimated_premium": round(estimated_premium),
         "base_rate": base_rate,
         "age_factor": age_multiplier,
-        "health_factor": health_multiplier.get(health, 1.0)
+        "health_factor": health_multiplier
     }
+
+def calculate_premium_estimate_vec(ages: np.ndarray, coverage_lakhs: int, policy_type: str, health: str) -> np.ndarray:
+    """Calculate estimated premiums for an array of ages"""
+    
+    age_multipliers = _AGE_MULT[np.searchsorted(_AGE_BINS, ages, side="right")]
+    
+    estimated_premiums = (
+        coverage_lakhs * 
+        _BASE_RATES.get(policy_type, 0.8) * 
+        age_multipliers * 
+        _HEALTH_MULT.get(health, 1.0) * 
+        1000  # Convert to rupees
+    )
+    
+    return np.round(estimated_premiums)
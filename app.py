@@ -1,19 +1,295 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
-from agent import get_policy_recommendation_with_ai, answer_insurance_question, calculate_premium_estimate
-from utils import validate_user_input, format_currency, get_faq_categories, load_clean_data
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.colors import HexColor
-import base64
+import numpy as np
+from agent import get_policy_recommendation_with_ai, stream_llm_reasoning, stream_insurance_answer, calculate_premium_estimate, calculate_premium_estimate_vec
+from utils import validate_user_input, format_currency, format_currency_vec, get_faq_categories, load_clean_data, DATA_PATH
 import io
+import os
 import datetime
 
+@st.cache_resource
+def _pdf_styles() -> dict:
+    """Build the immutable PDF report styles once instead of on every report"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.colors import HexColor
+    
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=HexColor('#2E86AB'),
+        alignment=1  # Center
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceAfter=12,
+        textColor=HexColor('#A23B72')
+    )
+    
+    profile_table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f0f8ff')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#2E86AB')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
+        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
+    ])
+    
+    policy_table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#e8f5e8')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#2d5a2d')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
+        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
+    ])
+    
+    alt_table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f0f0f0')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#333333')),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
+        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
+    ])
+    
+    return {
+        'styles': styles,
+        'title': title_style,
+        'heading': heading_style,
+        'profile_table': profile_table_style,
+        'policy_table': policy_table_style,
+        'alt_table': alt_table_style
+    }
+
+@st.cache_data(show_spinner=False)
+def _market_aggregates(data_mtime: float):
+    """Market Insights aggregates, recomputed only when the data file changes.
+
+    Raises ValueError when the data cannot be loaded, so a failed load is never cached.
+    """
+    df = load_clean_data(data_mtime)
+    
+    if df.empty:
+        raise ValueError("market data unavailable")
+    
+    coverage_stats = df.groupby('Policy_Type', observed=True).agg({
+        'Coverage_Lakhs': ['mean', 'min', 'max'],
+        'Premium_INR': 'mean'
+    }).round(2)
+    mean_premiums = coverage_stats[('Premium_INR', 'mean')]
+    
+    return {
+        'policy_dist': df['Policy_Type'].value_counts(),
+        'age_premium': df.groupby('Age')['Premium_INR'].mean().reset_index(),
+        'coverage_stats': coverage_stats,
+        # Display labels for the mean premiums, formatted in one pass and cached with the stats
+        'premium_labels': dict(zip(mean_premiums.tolist(), format_currency_vec(mean_premiums).tolist())),
+        'regional': df.groupby('Region', observed=True).agg({
+            'Premium_INR': 'mean',
+            'Coverage_Lakhs': 'mean'
+        }).reset_index() if 'Region' in df.columns else None
+    }
+
+@st.cache_resource(show_spinner=False)
+def _plotly_express():
+    """Import Plotly Express on first use and set the shared figure template once"""
+    import plotly.express as px
+    import plotly.io as pio
+    
+    # simple_white is lighter to resolve than the default plotly template, and is baked into the cached figures
+    pio.templates.default = "simple_white"
+    return px
+
+@st.cache_resource(show_spinner=False)
+def _market_figures(data_mtime: float):
+    """Market Insights figures, rebuilt only when the data file changes"""
+    px = _plotly_express()
+    
+    market_data = _market_aggregates(data_mtime)
+    
+    policy_dist = market_data['policy_dist']
+    fig_dist = px.pie(values=policy_dist.values, names=policy_dist.index, 
+                    title='Market Share by Policy Type')
+    
+    fig_trend = px.line(market_data['age_premium'], x='Age', y='Premium_INR', 
+                      title='Average Premium by Age')
+    
+    fig_regional = None
+    if market_data['regional'] is not None:
+        fig_regional = px.scatter(market_data['regional'], x='Premium_INR', y='Coverage_Lakhs', 
+                                color='Region', title='Regional Premium vs Coverage Analysis')
+    
+    return fig_dist, fig_trend, fig_regional
+
+COMPARISON_PLOT_COLUMNS = ['Policy_Type', 'Premium_INR', 'Coverage_Lakhs']
+
+# Keyed on just the plotted columns, so the key is a small tuple rather than a frame
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _comparison_figures(plot_rows: tuple):
+    """Policy Comparison figures for a set of top policies"""
+    px = _plotly_express()
+    top_policies = pd.DataFrame(list(plot_rows), columns=COMPARISON_PLOT_COLUMNS)
+    
+    fig_premium = px.pie(
+        top_policies, 
+        values='Premium_INR', 
+        names='Policy_Type',
+        title='Premium Distribution Among Top Policies'
+    )
+    
+    fig_coverage = px.scatter(
+        top_policies, 
+        x='Coverage_Lakhs', 
+        y='Premium_INR',
+        color='Policy_Type',
+        size='Coverage_Lakhs',
+        title='Coverage vs Premium Analysis'
+    )
+    
+    return fig_premium, fig_coverage
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _premium_figures(coverage_lakhs: int, policy_type: str, health: str,
+                     base_rate: float, age_factor: float, health_factor: float):
+    """Premium Calculator factor breakdown and premium-by-age curve"""
+    px = _plotly_express()
+    
+    factors_data = pd.DataFrame({
+        'Factor': ['Base Rate', 'Age Impact', 'Health Impact'],
+        'Multiplier': [base_rate, age_factor, health_factor]
+    })
+    
+    fig_factors = px.bar(factors_data, x='Factor', y='Multiplier', title='Premium Calculation Factors')
+    
+    # Premium across all ages for the selected coverage, policy type and health
+    curve_ages = np.arange(18, 81)
+    premium_curve = pd.DataFrame({
+        'Age': curve_ages,
+        'Premium_INR': calculate_premium_estimate_vec(curve_ages, coverage_lakhs, policy_type, health)
+    })
+    
+    fig_curve = px.line(
+        premium_curve, 
+        x='Age', 
+        y='Premium_INR',
+        title='Estimated Premium by Age',
+        labels={'Premium_INR': 'Annual Premium (₹)'}
+    )
+    
+    return fig_factors, fig_curve
+
+def generate_detailed_pdf_report(user_profile: dict, recommendation_data: dict) -> bytes:
+    """Generate detailed PDF report using ReportLab"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from reportlab.lib.units import inch
+    
+    pdf_styles = _pdf_styles()
+    styles = pdf_styles['styles']
+    title_style = pdf_styles['title']
+    heading_style = pdf_styles['heading']
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    
+    # Title
+    story.append(Paragraph("🛡️ Insurance Policy Recommendation Report", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Date
+    story.append(Paragraph(f"Generated on: {datetime.datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Customer Profile
+    story.append(Paragraph("👤 Customer Profile", heading_style))
+    profile_data = [
+        ['Age', f"{user_profile['age']} years"],
+        ['Annual Income', f"₹{user_profile['income']} LPA"],
+        ['Health Status', user_profile['health']],
+        ['Insurance Goal', user_profile['goal']],
+        ['Risk Score', f"{recommendation_data['risk_score']}/10"]
+    ]
+    
+    profile_table = Table(profile_data, colWidths=[2*inch, 3*inch])
+    profile_table.setStyle(pdf_styles['profile_table'])
+    
+    story.append(profile_table)
+    story.append(Spacer(1, 20))
+    
+    # Recommended Policy
+    best_policy = recommendation_data["best_policy"]
+    story.append(Paragraph("🎯 Recommended Policy", heading_style))
+    
+    policy_data = [
+        ['Policy Type', best_policy['Policy_Type']],
+        ['Coverage Amount', f"₹{best_policy['Coverage_Lakhs']} Lakhs"],
+        ['Annual Premium', format_currency(best_policy['Premium_INR'])],
+        ['Premium as % of Income', f"{(best_policy['Premium_INR'] / (user_profile['income'] * 1000)) * 100:.1f}%"]
+    ]
+    
+    policy_table = Table(policy_data, colWidths=[2*inch, 3*inch])
+    policy_table.setStyle(pdf_styles['policy_table'])
+    
+    story.append(policy_table)
+    story.append(Spacer(1, 20))
+    
+    # AI Reasoning
+    story.append(Paragraph("🤖 AI Analysis", heading_style))
+    story.append(Paragraph(recommendation_data.get("ai_reasoning", "Analysis completed"), styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Alternative Options
+    story.append(Paragraph("📋 Alternative Options", heading_style))
+    alt_data = [['Policy Type', 'Coverage (Lakhs)', 'Premium (₹)', 'Value Score']]
+    for policy in recommendation_data["top_policies_records"][:3]:
+        alt_data.append([
+            policy['Policy_Type'],
+            f"₹{policy['Coverage_Lakhs']}L",
+            format_currency(policy['Premium_INR']),
+            f"{policy['Value_Score']:.1f}"
+        ])
+    
+    alt_table = Table(alt_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.1*inch])
+    alt_table.setStyle(pdf_styles['alt_table'])
+    
+    story.append(alt_table)
+    story.append(Spacer(1, 20))
+    
+    # Disclaimer
+    story.append(Paragraph("⚠️ Important Disclaimer", heading_style))
+    disclaimer_text = """
+    This recommendation is based on AI analysis of your profile and market data. 
+    Please consult with a licensed insurance advisor before making final decisions. 
+    Terms and conditions apply. Premium rates may vary based on medical underwriting.
+    """
+    story.append(Paragraph(disclaimer_text, styles['Normal']))
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+# The hourly TTL keeps the report's "Generated on" date current
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_pdf_report(profile_key: tuple, policy_type: str, ai_reasoning: str, _recommendation_data: dict) -> bytes:
+    """PDF report for a profile, recommended policy and AI reasoning, reused across reruns"""
+    return generate_detailed_pdf_report(dict(profile_key), _recommendation_data)
+
 # Page configuration
 st.set_page_config(
     page_title="Insurance Policy Optimizer", 
@@ -116,7 +392,8 @@ if page == "🏠 Get Recommendation":
             }
             
             with st.spinner("🔍 AI is analyzing your profile and market data..."):
-                recommendation_data = get_policy_recommendation_with_ai(age, income, health, goal)
+                # The AI reasoning is streamed below once the recommendation is on screen
+                recommendation_data = get_policy_recommendation_with_ai(age, income, health, goal, include_reasoning=False)
                 st.session_state.recommendation_data = recommendation_data
             
             if "error" in recommendation_data:
@@ -137,10 +414,15 @@ if page == "🏠 Get Recommendation":
                 with col4:
                     st.metric("Risk Score", f"{recommendation_data['risk_score']}/10")
                 
-                # AI Reasoning
-                st.info(recommendation_data["ai_reasoning"])
+                # AI Reasoning, kept on the recommendation for the PDF report
+                recommendation_data["ai_reasoning"] = st.write_stream(stream_llm_reasoning(
+                    age, income, health, goal,
+                    best_policy, recommendation_data["risk_score"]
+                ))
                 
                 # Top recommendations chart
+                px = _plotly_express()
+                
                 top_policies = recommendation_data["top_policies"]
                 
                 fig = px.bar(
@@ -155,15 +437,19 @@ if page == "🏠 Get Recommendation":
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Generate and offer PDF download
-                if st.button("📄 Download Detailed Report", use_container_width=True):
-                    pdf_data = generate_detailed_pdf_report(
-                        st.session_state.user_profile, 
-                        recommendation_data
-                    )
-                    
-                    b64_pdf = base64.b64encode(pdf_data).decode('utf-8')
-                    href = f'<a href="data:application/pdf;base64,{b64_pdf}" download="Insurance_Recommendation_Report.pdf">📄 Click here to download your report</a>'
-                    st.markdown(href, unsafe_allow_html=True)
+                pdf_data = _cached_pdf_report(
+                    tuple(st.session_state.user_profile.items()),
+                    best_policy['Policy_Type'],
+                    recommendation_data.get("ai_reasoning", ""),
+                    recommendation_data
+                )
+                st.download_button(
+                    "📄 Download Detailed Report",
+                    data=pdf_data,
+                    file_name="Insurance_Recommendation_Report.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
 
 elif page == "📊 Policy Comparison":
     st.header("📊 Compare Insurance Policies")
@@ -180,37 +466,29 @@ elif page == "📊 Policy Comparison":
         # Comparison metrics
         col1, col2 = st.columns(2)
         
+        fig_premium, fig_coverage = _comparison_figures(
+            tuple(top_policies[COMPARISON_PLOT_COLUMNS].itertuples(index=False, name=None))
+        )
+        
         with col1:
             # Premium comparison
-            fig_premium = px.pie(
-                top_policies, 
-                values='Premium_INR', 
-                names='Policy_Type',
-                title='Premium Distribution Among Top Policies'
-            )
             st.plotly_chart(fig_premium, use_container_width=True)
         
         with col2:
             # Coverage comparison
-            fig_coverage = px.scatter(
-                top_policies, 
-                x='Coverage_Lakhs', 
-                y='Premium_INR',
-                color='Policy_Type',
-                size='Coverage_Lakhs',
-                title='Coverage vs Premium Analysis'
-            )
             st.plotly_chart(fig_coverage, use_container_width=True)
         
         # Detailed comparison table
         st.subheader("📋 Detailed Policy Comparison")
         
-        comparison_df = top_policies[['Policy_Type', 'Coverage_Lakhs', 'Premium_INR', 'Age']].copy()
-        comparison_df['Value Score'] = comparison_df['Coverage_Lakhs'] / (comparison_df['Premium_INR'] / 1000)
-        comparison_df['Value Score'] = comparison_df['Value Score'].round(2)
+        # Only the styler needs a DataFrame; the rows are precomputed with the recommendation
+        comparison_df = pd.DataFrame(recommendation_data["top_policies_records"]).rename(
+            columns={'Value_Score': 'Value Score'}
+        ).round({'Value Score': 2})
         
         st.dataframe(
-            comparison_df.style.highlight_max(axis=0, subset=['Coverage_Lakhs', 'Value Score']).highlight_min(axis=0, subset=['Premium_INR']),
+            comparison_df.style.highlight_max(axis=0, subset=['Coverage_Lakhs', 'Value Score']).highlight_min(axis=0, subset=['Premium_INR'])
+            .format({'Premium_INR': format_currency}),
             use_container_width=True
         )
 
@@ -240,14 +518,13 @@ elif page == "💰 Premium Calculator":
         with col3:
             st.metric("Health Factor", f"{estimate['health_factor']}x")
         
-        # Premium breakdown chart
-        factors_data = pd.DataFrame({
-            'Factor': ['Base Rate', 'Age Impact', 'Health Impact'],
-            'Multiplier': [estimate['base_rate'], estimate['age_factor'], estimate['health_factor']]
-        })
-        
-        fig = px.bar(factors_data, x='Factor', y='Multiplier', title='Premium Calculation Factors')
-        st.plotly_chart(fig, use_container_width=True)
+        # Premium breakdown chart and premium-by-age curve
+        fig_factors, fig_curve = _premium_figures(
+            calc_coverage, calc_policy_type, calc_health,
+            estimate['base_rate'], estimate['age_factor'], estimate['health_factor']
+        )
+        st.plotly_chart(fig_factors, use_container_width=True)
+        st.plotly_chart(fig_curve, use_container_width=True)
 
 elif page == "❓ Insurance FAQ":
     st.header("❓ Frequently Asked Questions")
@@ -262,9 +539,8 @@ elif page == "❓ Insurance FAQ":
     
     if st.button("Ask AI", use_container_width=True):
         if user_question.strip():
-            answer = answer_insurance_question(user_question)
             st.success("🤖 **AI Advisor:**")
-            st.write(answer)
+            st.write_stream(stream_insurance_answer(user_question))
         else:
             st.warning("❗ Please enter a question first.")
     
@@ -277,189 +553,49 @@ elif page == "❓ Insurance FAQ":
     
     for category, faqs in faq_categories.items():
         with st.expander(f"📂 {category}"):
-            for faq in faqs:
-                st.write(f"**Q: {faq['question']}**")
-                st.write(f"A: {faq['answer']}")
+            for question, answer in faqs:
+                st.write(f"**Q: {question}**")
+                st.write(f"A: {answer}")
                 st.write("---")
 
 elif page == "📈 Market Insights":
     st.header("📈 Insurance Market Insights")
     
-    df = load_clean_data()
+    data_mtime = os.path.getmtime(DATA_PATH) if os.path.exists(DATA_PATH) else None
+    try:
+        market_data = _market_aggregates(data_mtime) if data_mtime is not None else None
+    except ValueError:
+        market_data = None
     
-    if not df.empty:
+    if market_data is not None:
+        fig_dist, fig_trend, fig_regional = _market_figures(data_mtime)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             # Policy type distribution
-            policy_dist = df['Policy_Type'].value_counts()
-            fig_dist = px.pie(values=policy_dist.values, names=policy_dist.index, 
-                            title='Market Share by Policy Type')
             st.plotly_chart(fig_dist, use_container_width=True)
         
         with col2:
             # Age vs Premium trends
-            age_premium = df.groupby('Age')['Premium_INR'].mean().reset_index()
-            fig_trend = px.line(age_premium, x='Age', y='Premium_INR', 
-                              title='Average Premium by Age')
             st.plotly_chart(fig_trend, use_container_width=True)
         
         # Coverage analysis
         st.subheader("📊 Coverage Analysis")
-        coverage_stats = df.groupby('Policy_Type').agg({
-            'Coverage_Lakhs': ['mean', 'min', 'max'],
-            'Premium_INR': 'mean'
-        }).round(2)
-        
-        st.dataframe(coverage_stats, use_container_width=True)
+        # Formatted for display only, so the premium column still sorts numerically
+        st.dataframe(
+            market_data['coverage_stats'].style.format(precision=2)
+            .format({('Premium_INR', 'mean'): market_data['premium_labels'].__getitem__}),
+            use_container_width=True
+        )
         
         # Regional insights
-        if 'Region' in df.columns:
+        if fig_regional is not None:
             st.subheader("🗺️ Regional Insights")
-            regional_data = df.groupby('Region').agg({
-                'Premium_INR': 'mean',
-                'Coverage_Lakhs': 'mean'
-            }).reset_index()
-            
-            fig_regional = px.scatter(regional_data, x='Premium_INR', y='Coverage_Lakhs', 
-                                    color='Region', title='Regional Premium vs Coverage Analysis')
             st.plotly_chart(fig_regional, use_container_width=True)
     else:
         st.error("❌ Unable to load market data for insights.")
 
-def generate_detailed_pdf_report(user_profile: dict, recommendation_data: dict) -> bytes:
-    """Generate detailed PDF report using ReportLab"""
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=HexColor('#2E86AB'),
-        alignment=1  # Center
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        spaceAfter=12,
-        textColor=HexColor('#A23B72')
-    )
-    
-    # Title
-    story.append(Paragraph("🛡️ Insurance Policy Recommendation Report", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Date
-    story.append(Paragraph(f"Generated on: {datetime.datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Customer Profile
-    story.append(Paragraph("👤 Customer Profile", heading_style))
-    profile_data = [
-        ['Age', f"{user_profile['age']} years"],
-        ['Annual Income', f"₹{user_profile['income']} LPA"],
-        ['Health Status', user_profile['health']],
-        ['Insurance Goal', user_profile['goal']],
-        ['Risk Score', f"{recommendation_data['risk_score']}/10"]
-    ]
-    
-    profile_table = Table(profile_data, colWidths=[2*inch, 3*inch])
-    profile_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f0f8ff')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#2E86AB')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
-        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
-    ]))
-    
-    story.append(profile_table)
-    story.append(Spacer(1, 20))
-    
-    # Recommended Policy
-    best_policy = recommendation_data["best_policy"]
-    story.append(Paragraph("🎯 Recommended Policy", heading_style))
-    
-    policy_data = [
-        ['Policy Type', best_policy['Policy_Type']],
-        ['Coverage Amount', f"₹{best_policy['Coverage_Lakhs']} Lakhs"],
-        ['Annual Premium', format_currency(best_policy['Premium_INR'])],
-        ['Premium as % of Income', f"{(best_policy['Premium_INR'] / (user_profile['income'] * 1000)) * 100:.1f}%"]
-    ]
-    
-    policy_table = Table(policy_data, colWidths=[2*inch, 3*inch])
-    policy_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#e8f5e8')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#2d5a2d')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
-        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
-    ]))
-    
-    story.append(policy_table)
-    story.append(Spacer(1, 20))
-    
-    # AI Reasoning
-    story.append(Paragraph("🤖 AI Analysis", heading_style))
-    story.append(Paragraph(recommendation_data.get("ai_reasoning", "Analysis completed"), styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Alternative Options
-    story.append(Paragraph("📋 Alternative Options", heading_style))
-    top_policies = recommendation_data["top_policies"].head(3)
-    
-    alt_data = [['Policy Type', 'Coverage (Lakhs)', 'Premium (₹)', 'Value Score']]
-    for _, policy in top_policies.iterrows():
-        value_score = policy['Coverage_Lakhs'] / (policy['Premium_INR'] / 1000)
-        alt_data.append([
-            policy['Policy_Type'],
-            f"₹{policy['Coverage_Lakhs']}L",
-            format_currency(policy['Premium_INR']),
-            f"{value_score:.1f}"
-        ])
-    
-    alt_table = Table(alt_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.1*inch])
-    alt_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f0f0f0')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#333333')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), HexColor('#ffffff')),
-        ('GRID', (0, 0), (-1, -1), 1, HexColor('#cccccc'))
-    ]))
-    
-    story.append(alt_table)
-    story.append(Spacer(1, 20))
-    
-    # Disclaimer
-    story.append(Paragraph("⚠️ Important Disclaimer", heading_style))
-    disclaimer_text = """
-    This recommendation is based on AI analysis of your profile and market data. 
-    Please consult with a licensed insurance advisor before making final decisions. 
-    Terms and conditions apply. Premium rates may vary based on medical underwriting.
-    """
-    story.append(Paragraph(disclaimer_text, styles['Normal']))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue()
-
 # Footer
 st.markdown("---")
 st.markdown(
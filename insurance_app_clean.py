@@ -3,6 +3,9 @@ import pandas as pd
 from datetime import datetime
 import base64
 import io
+import heapq
+import html
+from utils import load_clean_data, prepare_index, top_policies_index, calculate_risk_score, validate_user_input, get_faq_categories
 
 # Page configuration
 st.set_page_config(
@@ -12,8 +15,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better styling
-st.markdown("""
+# Custom CSS and header markup, built once per process and reused on every rerun
+@st.cache_resource
+def _chrome():
+    css = """
 <style>
     .main-header {
         text-align: center;
@@ -38,75 +43,19 @@ st.markdown("""
         margin: 0.5rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
-
-# Load insurance data
-@st.cache_data
-def load_clean_data():
-    try:
-        df = pd.read_csv('cleaned_insurance_data.csv')
-        return df
-    except FileNotFoundError:
-        st.error("Insurance data file not found. Please ensure 'cleaned_insurance_data.csv' exists.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return pd.DataFrame()
+"""
+    header = """
+<div class="main-header">
+    <h1>🛡️ Insurance Policy Optimizer</h1>
+    <p>AI-Powered Personalized Insurance Recommendations</p>
+</div>
+"""
+    return css, header
 
-def validate_user_input(age, income, health, goal):
-    try:
-        age = int(age)
-        income = float(income)
-        
-        if age < 18 or age > 100:
-            return False, "Age must be between 18 and 100 years."
-        
-        if income <= 0 or income > 1000:
-            return False, "Annual income must be between 1 and 1000 LPA."
-        
-        if health not in ["Good", "Average", "Poor"]:
-            return False, "Please select a valid health status."
-        
-        if not goal.strip():
-            return False, "Please provide your insurance goal."
-        
-        if len(goal.strip()) < 5:
-            return False, "Please provide a more detailed insurance goal (at least 5 characters)."
-        
-        return True, "Valid input"
-    except (ValueError, TypeError):
-        return False, "Please enter valid numeric values for age and income."
+css, header = _chrome()
 
-def calculate_risk_score(age, health, income):
-    risk_score = 0.0
-    
-    # Convert inputs to proper types
-    age = int(age)
-    income = float(income)
-    
-    # Age factor
-    if age < 25:
-        risk_score += 1.0
-    elif age < 35:
-        risk_score += 1.5
-    elif age < 50:
-        risk_score += 2.0
-    else:
-        risk_score += 3.0
-    
-    # Health factor
-    health_multiplier = {"Good": 1.0, "Average": 1.5, "Poor": 2.5}
-    risk_score *= health_multiplier.get(health, 1.0)
-    
-    # Income factor (lower income = higher risk)
-    if income < 5:
-        risk_score *= 1.3
-    elif income < 15:
-        risk_score *= 1.1
-    else:
-        risk_score *= 0.9
-    
-    return round(risk_score, 2)
+# Custom CSS for better styling
+st.markdown(css, unsafe_allow_html=True)
 
 def get_policy_recommendations(age, income, health, goal):
     df = load_clean_data()
@@ -117,39 +66,39 @@ def get_policy_recommendations(age, income, health, goal):
     # Calculate risk score
     risk_score = calculate_risk_score(age, health, income)
     
-    # Filter policies based on age range and coverage
-    age_filtered = df[
-        (df['Age'] >= age - 5) & 
-        (df['Age'] <= age + 5)
-    ]
+    # Filter policies based on age range and coverage, using the precomputed per-age leaders
+    index = prepare_index(df)
+    buckets = top_policies_index(df)
+    age_window = range(age - 5, age + 6)
     
     # Health-based filtering
     if health == "Poor":
         # For poor health, recommend comprehensive coverage
-        health_filtered = age_filtered[age_filtered['Policy_Type'].isin(['Health', 'Comprehensive'])]
+        allowed_types = ['Health', 'Comprehensive']
     elif health == "Good":
         # For good health, all options available
-        health_filtered = age_filtered
+        allowed_types = index['ptype_categories']
     else:
         # For average health, exclude high-risk policies
-        health_filtered = age_filtered[age_filtered['Policy_Type'].isin(['Health', 'Term Life', 'Comprehensive'])]
+        allowed_types = ['Health', 'Term Life', 'Comprehensive']
     
-    if health_filtered.empty:
-        health_filtered = age_filtered  # Fallback to age-filtered data
+    health_buckets = [buckets[(a, t)] for a in age_window for t in allowed_types if (a, t) in buckets]
     
-    # Sort by value (coverage/premium ratio) and premium
-    if not health_filtered.empty:
-        health_filtered = health_filtered.sort_values(
-            ['Coverage_Lakhs', 'Premium_INR'], 
-            ascending=[False, True]
-        )
-        
-        top_policies = health_filtered.head(3).to_dict('records')
+    if not health_buckets:
+        # Fallback to age-filtered data
+        health_buckets = [buckets[(a, t)] for a in age_window for t in index['ptype_categories'] if (a, t) in buckets]
+    
+    total_policies_found = sum(count for count, _ in health_buckets)
+    
+    if total_policies_found > 0:
+        # Bucket leaders carry their rank in the coverage desc, premium asc ordering
+        leaders = heapq.nsmallest(3, (leader for _, bucket_leaders in health_buckets for leader in bucket_leaders))
+        top_policies = [dict(record) for _, record in leaders]
         
         return {
             "policies": top_policies,
             "risk_score": risk_score,
-            "total_policies_found": len(health_filtered),
+            "total_policies_found": total_policies_found,
             "recommendation_basis": f"Based on age {age}, {health.lower()} health, and income ₹{income}L"
         }
     else:
@@ -176,6 +125,125 @@ def generate_ai_reasoning(age, income, health, goal, recommended_policy, risk_sc
     This recommendation is based on data analysis of similar customer profiles in our database.
     """
 
+# Policies split by type once, in order of first appearance like Series.unique();
+# a cached resource so fragment reruns share the frames instead of unpickling copies
+@st.cache_resource(show_spinner=False)
+def by_policy_type(df):
+    return {policy_type: group.reset_index(drop=True) for policy_type, group in df.groupby('Policy_Type', observed=True, sort=False)}
+
+# Comparison selectbox labels, built with vectorized string ops and cached per frame and policy type,
+# plus a label -> policy record lookup for the selected option; shared like by_policy_type()
+@st.cache_resource(show_spinner=False)
+def policy_options(df, policy_type):
+    filtered_df = by_policy_type(df)[policy_type]
+    options = (
+        filtered_df['Policy_Type'].astype(str) + ' - ₹' +
+        filtered_df['Coverage_Lakhs'].astype(str) + 'L (₹' +
+        filtered_df['Premium_INR'].astype(str) + ')'
+    ).tolist()
+    # Filled in reverse so duplicate labels resolve to their first row, as list.index() did
+    lookup = dict(zip(reversed(options), reversed(filtered_df.to_dict('records'))))
+    return options, lookup
+
+# Market Insights aggregates; the frame comes from the cached loader, so its shape is a cheap cache key
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: lambda d: d.shape})
+def market_aggs(df):
+    policy_distribution = df['Policy_Type'].value_counts().rename_axis('Policy_Type').reset_index(name='count')
+    age_premium = df.groupby('Age', sort=True)['Premium_INR'].mean().reset_index()
+    coverage_stats = df.groupby('Policy_Type', observed=True).agg({
+        'Coverage_Lakhs': ['mean', 'min', 'max'],
+        'Premium_INR': 'mean'
+    }).round(2)
+    return policy_distribution, age_premium, coverage_stats
+
+# Comparison widgets run as a fragment, so changing a selection reruns only this block
+@st.fragment
+def comparison_ui(df):
+    policy_1 = policy_2 = None
+    groups = by_policy_type(df)
+    
+    # Policy selection
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Select First Policy")
+        policy_types_1 = st.selectbox("Policy Type", list(groups), key="policy1")
+        filtered_df_1 = groups[policy_types_1]
+        
+        if not filtered_df_1.empty:
+            policy_1_options, policy_1_lookup = policy_options(df, policy_types_1)
+            selected_1 = st.selectbox("Choose Policy", policy_1_options, key="select1")
+            policy_1 = policy_1_lookup[selected_1]
+    
+    with col2:
+        st.subheader("Select Second Policy")
+        policy_types_2 = st.selectbox("Policy Type", list(groups), key="policy2")
+        filtered_df_2 = groups[policy_types_2]
+        
+        if not filtered_df_2.empty:
+            policy_2_options, policy_2_lookup = policy_options(df, policy_types_2)
+            selected_2 = st.selectbox("Choose Policy", policy_2_options, key="select2")
+            policy_2 = policy_2_lookup[selected_2]
+    
+    # Comparison table
+    if policy_1 is not None and policy_2 is not None:
+        st.subheader("Detailed Comparison")
+        
+        comparison_data = {
+            "Feature": ["Policy Type", "Coverage Amount", "Annual Premium", "Age Group", "Health Requirements"],
+            "Policy 1": [
+                policy_1['Policy_Type'],
+                f"₹{policy_1['Coverage_Lakhs']} Lakhs",
+                f"₹{policy_1['Premium_INR']:,.0f}",
+                f"{policy_1['Age']} years",
+                "Standard"
+            ],
+            "Policy 2": [
+                policy_2['Policy_Type'],
+                f"₹{policy_2['Coverage_Lakhs']} Lakhs", 
+                f"₹{policy_2['Premium_INR']:,.0f}",
+                f"{policy_2['Age']} years",
+                "Standard"
+            ]
+        }
+        
+        # Plain HTML for a fixed 5x3 table, skipping DataFrame construction and serialization
+        header_cells = ''.join(f"<th>{html.escape(column)}</th>" for column in comparison_data)
+        rows = ''.join(
+            "<tr>" + ''.join(f"<td>{html.escape(str(value))}</td>" for value in row) + "</tr>"
+            for row in zip(*comparison_data.values())
+        )
+        st.markdown(f"<table><thead><tr>{header_cells}</tr></thead><tbody>{rows}</tbody></table>", unsafe_allow_html=True)
+        
+        # Value analysis
+        st.subheader("Value Analysis")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            premium_diff = policy_2['Premium_INR'] - policy_1['Premium_INR']
+            st.metric("Premium Difference", f"₹{premium_diff:,.0f}", 
+                     delta=f"Policy 2 {'higher' if premium_diff > 0 else 'lower'}")
+        
+        with col2:
+            coverage_diff = policy_2['Coverage_Lakhs'] - policy_1['Coverage_Lakhs']
+            st.metric("Coverage Difference", f"₹{coverage_diff} Lakhs",
+                     delta=f"Policy 2 {'higher' if coverage_diff > 0 else 'lower'}")
+        
+        with col3:
+            value_ratio_1 = policy_1['Coverage_Lakhs'] / policy_1['Premium_INR'] * 100000
+            value_ratio_2 = policy_2['Coverage_Lakhs'] / policy_2['Premium_INR'] * 100000
+            better_value = "Policy 1" if value_ratio_1 > value_ratio_2 else "Policy 2"
+            st.metric("Better Value", better_value)
+        
+        # Recommendation
+        if premium_diff < 0 and coverage_diff >= 0:
+            st.success("🎯 Policy 2 offers better or equal coverage at a lower premium!")
+        elif premium_diff > 0 and coverage_diff > 0:
+            st.info(f"Policy 2 costs ₹{premium_diff:,.0f} more but provides ₹{coverage_diff} Lakhs additional coverage")
+        else:
+            st.warning("Consider your specific needs when choosing between these policies")
+
 # Initialize session state
 if 'recommendation_data' not in st.session_state:
     st.session_state.recommendation_data = None
@@ -183,12 +251,7 @@ if 'user_profile' not in st.session_state:
     st.session_state.user_profile = None
 
 # Header
-st.markdown("""
-<div class="main-header">
-    <h1>🛡️ Insurance Policy Optimizer</h1>
-    <p>AI-Powered Personalized Insurance Recommendations</p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(header, unsafe_allow_html=True)
 
 # Sidebar for navigation
 st.sidebar.title("Navigation")
@@ -297,86 +360,7 @@ elif page == "Policy Comparison":
     
     df = load_clean_data()
     if not df.empty:
-        # Policy selection
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Select First Policy")
-            policy_types_1 = st.selectbox("Policy Type", df['Policy_Type'].unique(), key="policy1")
-            filtered_df_1 = df[df['Policy_Type'] == policy_types_1]
-            
-            if not filtered_df_1.empty:
-                policy_1_options = [f"{row['Policy_Type']} - ₹{row['Coverage_Lakhs']}L (₹{row['Premium_INR']})" 
-                                  for _, row in filtered_df_1.iterrows()]
-                selected_1 = st.selectbox("Choose Policy", policy_1_options, key="select1")
-                policy_1_idx = policy_1_options.index(selected_1)
-                policy_1 = filtered_df_1.iloc[policy_1_idx]
-        
-        with col2:
-            st.subheader("Select Second Policy")
-            policy_types_2 = st.selectbox("Policy Type", df['Policy_Type'].unique(), key="policy2")
-            filtered_df_2 = df[df['Policy_Type'] == policy_types_2]
-            
-            if not filtered_df_2.empty:
-                policy_2_options = [f"{row['Policy_Type']} - ₹{row['Coverage_Lakhs']}L (₹{row['Premium_INR']})" 
-                                  for _, row in filtered_df_2.iterrows()]
-                selected_2 = st.selectbox("Choose Policy", policy_2_options, key="select2")
-                policy_2_idx = policy_2_options.index(selected_2)
-                policy_2 = filtered_df_2.iloc[policy_2_idx]
-        
-        # Comparison table
-        if 'policy_1' in locals() and 'policy_2' in locals():
-            st.subheader("Detailed Comparison")
-            
-            comparison_data = {
-                "Feature": ["Policy Type", "Coverage Amount", "Annual Premium", "Age Group", "Health Requirements"],
-                "Policy 1": [
-                    policy_1['Policy_Type'],
-                    f"₹{policy_1['Coverage_Lakhs']} Lakhs",
-                    f"₹{policy_1['Premium_INR']:,.0f}",
-                    f"{policy_1['Age']} years",
-                    "Standard"
-                ],
-                "Policy 2": [
-                    policy_2['Policy_Type'],
-                    f"₹{policy_2['Coverage_Lakhs']} Lakhs", 
-                    f"₹{policy_2['Premium_INR']:,.0f}",
-                    f"{policy_2['Age']} years",
-                    "Standard"
-                ]
-            }
-            
-            comparison_df = pd.DataFrame(comparison_data)
-            st.table(comparison_df)
-            
-            # Value analysis
-            st.subheader("Value Analysis")
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                premium_diff = policy_2['Premium_INR'] - policy_1['Premium_INR']
-                st.metric("Premium Difference", f"₹{premium_diff:,.0f}", 
-                         delta=f"Policy 2 {'higher' if premium_diff > 0 else 'lower'}")
-            
-            with col2:
-                coverage_diff = policy_2['Coverage_Lakhs'] - policy_1['Coverage_Lakhs']
-                st.metric("Coverage Difference", f"₹{coverage_diff} Lakhs",
-                         delta=f"Policy 2 {'higher' if coverage_diff > 0 else 'lower'}")
-            
-            with col3:
-                value_ratio_1 = policy_1['Coverage_Lakhs'] / policy_1['Premium_INR'] * 100000
-                value_ratio_2 = policy_2['Coverage_Lakhs'] / policy_2['Premium_INR'] * 100000
-                better_value = "Policy 1" if value_ratio_1 > value_ratio_2 else "Policy 2"
-                st.metric("Better Value", better_value)
-            
-            # Recommendation
-            if premium_diff < 0 and coverage_diff >= 0:
-                st.success("🎯 Policy 2 offers better or equal coverage at a lower premium!")
-            elif premium_diff > 0 and coverage_diff > 0:
-                st.info(f"Policy 2 costs ₹{premium_diff:,.0f} more but provides ₹{coverage_diff} Lakhs additional coverage")
-            else:
-                st.warning("Consider your specific needs when choosing between these policies")
+        comparison_ui(df)
     
     else:
         st.error("Unable to load policy data for comparison.")
@@ -385,70 +369,45 @@ elif page == "Insurance FAQ":
     st.header("Frequently Asked Questions")
     
     # FAQ sections
-    faq_categories = {
-        "Basic Insurance": [
-            {
-                "question": "What is term insurance?",
-                "answer": "Term insurance provides life coverage for a specific period. It's pure protection with no investment component, making it affordable for high coverage amounts."
-            },
-            {
-                "question": "What is health insurance?",
-                "answer": "Health insurance covers medical expenses including hospitalization, surgery, and treatments. It protects you from high healthcare costs in India."
-            },
-            {
-                "question": "What is comprehensive insurance?",
-                "answer": "Comprehensive insurance combines multiple coverages like life, health, and accident protection in one policy, offering complete family protection."
-            }
-        ],
-        "Policy Selection": [
-            {
-                "question": "How much coverage do I need?",
-                "answer": "Generally, life coverage should be 10-15 times your annual income. For health insurance, start with ₹5-10 lakhs and increase based on family size and medical history."
-            },
-            {
-                "question": "When should I buy insurance?",
-                "answer": "Buy insurance as early as possible. Premiums are lower when you're young and healthy. Don't wait for life events like marriage or having children."
-            },
-            {
-                "question": "What factors affect premium?",
-                "answer": "Age, health status, lifestyle habits, coverage amount, policy type, and family medical history are key factors that determine your insurance premium."
-            }
-        ]
-    }
+    faq_categories = get_faq_categories()
     
     for category, faqs in faq_categories.items():
         st.subheader(category)
-        for faq in faqs:
-            with st.expander(faq["question"]):
-                st.write(faq["answer"])
+        for question, answer in faqs:
+            with st.expander(question):
+                st.write(answer)
 
 elif page == "Market Insights":
     st.header("📊 Insurance Market Insights")
     st.write("Analysis of insurance trends and market data")
     
+    import altair as alt
+    
     df = load_clean_data()
     if not df.empty:
+        # Tidy cached frames go straight into the Altair specs
+        policy_distribution, age_premium, coverage_stats = market_aggs(df)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             # Policy type distribution
-            policy_distribution = df['Policy_Type'].value_counts()
             st.subheader("Policy Type Distribution")
-            st.bar_chart(policy_distribution)
+            st.altair_chart(
+                alt.Chart(policy_distribution).mark_bar().encode(x='Policy_Type', y='count'),
+                use_container_width=True
+            )
         
         with col2:
             # Age vs Premium trends
-            age_premium = df.groupby('Age')['Premium_INR'].mean().reset_index()
             st.subheader("Average Premium by Age")
-            st.line_chart(age_premium.set_index('Age'))
+            st.altair_chart(
+                alt.Chart(age_premium).mark_line().encode(x='Age', y='Premium_INR'),
+                use_container_width=True
+            )
         
         # Coverage analysis
         st.subheader("Coverage Analysis")
-        coverage_stats = df.groupby('Policy_Type').agg({
-            'Coverage_Lakhs': ['mean', 'min', 'max'],
-            'Premium_INR': 'mean'
-        }).round(2)
-        
         st.dataframe(coverage_stats, use_container_width=True)
     else:
         st.error("Unable to load market data for insights.")
@@ -0,0 +1,236 @@
+import contextlib
+import copy
+import os
+import threading
+
+# Pre-quantized TinyLlama chat weights for llama.cpp
+GGUF_REPO_ID = "TheBloke/TinyLlama-1.1B-Chat-v1.0-GGUF"
+GGUF_FILENAME = "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
+
+class LlamaCppPipeline:
+    """llama.cpp model exposed through the Hugging Face text-generation pipeline call signature"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        # A llama.cpp context is not thread-safe and is shared by every Streamlit session
+        self._lock = threading.Lock()
+        self._prefix_states = {}
+
+    def cache_prefix(self, prefix: str):
+        """Evaluate a fixed prompt prefix once and keep its KV state for reuse"""
+        with self._lock:
+            self.llm.reset()
+            self.llm.eval(self.llm.tokenize(prefix.encode("utf-8")))
+            self._prefix_states[prefix] = self.llm.save_state()
+
+    def _restore_prefix(self, prompt: str):
+        # Restoring the prefix state lets llama.cpp skip prefilling the matching tokens
+        for prefix, state in self._prefix_states.items():
+            if prompt.startswith(prefix):
+                self.llm.load_state(state)
+                break
+
+    @staticmethod
+    def _completion_kwargs(max_new_tokens: int = 128, do_sample: bool = True,
+                           temperature: float = 0.8, top_k: int = 40, top_p: float = 0.95,
+                           repetition_penalty: float = 1.1, stop: tuple = (), **kwargs) -> dict:
+        """Map pipeline-style generation arguments onto llama.cpp completion arguments"""
+        return {
+            "max_tokens": max_new_tokens,
+            "temperature": temperature if do_sample else 0.0,
+            "top_k": top_k,
+            "top_p": top_p,
+            "repeat_penalty": repetition_penalty,
+            "stop": list(stop)
+        }
+
+    def __call__(self, prompt: str, **kwargs) -> list:
+        with self._lock:
+            self._restore_prefix(prompt)
+            output = self.llm(prompt, **self._completion_kwargs(**kwargs))
+
+        return [{"generated_text": output["choices"][0]["text"]}]
+
+    def stream(self, prompt: str, **kwargs):
+        """Yield generated text chunk by chunk as llama.cpp samples it"""
+        # The context stays locked until the stream is exhausted or closed
+        with self._lock:
+            self._restore_prefix(prompt)
+            for chunk in self.llm(prompt, stream=True, **self._completion_kwargs(**kwargs)):
+                yield chunk["choices"][0]["text"]
+
+def truncate_at_stop(text: str, stop: tuple) -> str:
+    """Cut generated text at the first stop sequence it contains"""
+    for sequence in stop:
+        index = text.find(sequence)
+        if index != -1:
+            text = text[:index]
+    return text
+
+class StopOnTokens:
+    """Stopping criterion that ends generate() once a stop sequence has been decoded"""
+
+    def __init__(self, tokenizer, stop: tuple, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.stop = stop
+        self.prompt_length = prompt_length
+        # Only the last few tokens can complete a stop sequence, so only they are decoded
+        self.window = max(len(tokenizer(sequence, add_special_tokens=False).input_ids) for sequence in stop) + 1
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        start = max(self.prompt_length, input_ids.shape[1] - self.window)
+        texts = self.tokenizer.batch_decode(input_ids[:, start:])
+        return torch.tensor(
+            [any(sequence in text for sequence in self.stop) for text in texts],
+            dtype=torch.bool,
+            device=input_ids.device
+        )
+
+class TransformersPipeline:
+    """Hugging Face model exposed through the text-generation pipeline call signature.
+
+    Fixed prompt prefixes are tokenized once and their KV state is cached, so each
+    call only tokenizes and prefills the dynamic tail of the prompt.
+    """
+
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self._prefixes = {}
+        # Token ids of the newline used to anchor tail tokenization, see _encode_tail()
+        self._anchor_ids = tokenizer("\n", add_special_tokens=False).input_ids
+        # The static cache lives on the shared model and generate() resets it per call,
+        # so compiled generations are serialized like a llama.cpp context
+        self._lock = threading.Lock()
+        self.compiled = False
+
+    def compile(self):
+        """Compile the forward pass over a static KV cache and warm it up once"""
+        import torch
+
+        eager_forward = self.model.forward
+        try:
+            self.model.forward = torch.compile(eager_forward, mode="reduce-overhead", fullgraph=False, dynamic=False)
+            # A fixed-shape cache lets every decode step reuse the same compiled graph
+            self.model.generation_config.cache_implementation = "static"
+            self._generate(self.tokenizer("Hello").input_ids, max_new_tokens=4, do_sample=False)
+        except Exception:
+            self.model.forward = eager_forward
+            self.model.generation_config.cache_implementation = None
+            raise
+        self.compiled = True
+
+    def cache_prefix(self, prefix: str):
+        """Tokenize a fixed prompt prefix once and keep its past_key_values"""
+        import torch
+
+        prefix_ids = self.tokenizer(prefix).input_ids
+        past_key_values = None
+
+        # generate() rejects an external past_key_values together with the static cache
+        if not self.compiled:
+            with torch.no_grad():
+                outputs = self.model(
+                    input_ids=torch.tensor([prefix_ids], device=self.model.device),
+                    use_cache=True
+                )
+            past_key_values = outputs.past_key_values
+
+        self._prefixes[prefix] = (prefix_ids, past_key_values)
+
+    def _encode_tail(self, text: str) -> list:
+        """Tokenize text that continues a prompt after a newline.
+
+        SentencePiece marks the start of standalone text as a word boundary, so the
+        text is encoded behind a newline anchor whose ids are then dropped.
+        """
+        ids = self.tokenizer("\n" + text, add_special_tokens=False).input_ids
+        return ids[len(self._anchor_ids):]
+
+    def _encode(self, prompt: str) -> tuple:
+        """Prompt token ids, plus the cached KV state of its prefix when one matches"""
+        for prefix, (prefix_ids, past_key_values) in self._prefixes.items():
+            if prompt.startswith(prefix) and prefix.endswith("\n"):
+                return prefix_ids + self._encode_tail(prompt[len(prefix):]), past_key_values
+
+        return self.tokenizer(prompt).input_ids, None
+
+    def _generate(self, input_ids: list, past_key_values=None, stop: tuple = (), **kwargs) -> str:
+        import torch
+        from transformers import StoppingCriteriaList
+
+        input_tensor = torch.tensor([input_ids], device=self.model.device)
+        if past_key_values is not None:
+            # generate() extends the cache in place, so every call gets its own copy
+            kwargs["past_key_values"] = copy.deepcopy(past_key_values)
+        if stop:
+            kwargs["stopping_criteria"] = StoppingCriteriaList([StopOnTokens(self.tokenizer, stop, len(input_ids))])
+        kwargs.setdefault("eos_token_id", self.tokenizer.eos_token_id)
+
+        with self._lock if self.compiled else contextlib.nullcontext(), torch.no_grad():
+            output_ids = self.model.generate(
+                input_ids=input_tensor,
+                attention_mask=torch.ones_like(input_tensor),
+                **kwargs
+            )
+
+        return truncate_at_stop(self.tokenizer.decode(output_ids[0, len(input_ids):], skip_special_tokens=True), stop)
+
+    def __call__(self, prompt: str, **kwargs) -> list:
+        input_ids, past_key_values = self._encode(prompt)
+
+        return [{"generated_text": self._generate(input_ids, past_key_values, **kwargs)}]
+
+    def stream(self, prompt: str, **kwargs):
+        """Yield generated text as it is decoded, running generate() on a background thread"""
+        from transformers import TextIteratorStreamer
+
+        input_ids, past_key_values = self._encode(prompt)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        errors = []
+
+        def run():
+            try:
+                self._generate(input_ids, past_key_values, streamer=streamer, **kwargs)
+            except Exception as e:
+                # Unblock the consumer, then re-raise the error on its side
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        # The streamer flushes whole words, so a stop sequence is cut before it reaches the caller
+        stop = kwargs.get("stop", ())
+        text, emitted = "", 0
+        for chunk in streamer:
+            text += chunk
+            truncated = truncate_at_stop(text, stop)
+            if len(truncated) > emitted:
+                yield truncated[emitted:]
+                emitted = len(truncated)
+            if len(truncated) < len(text):
+                break
+        thread.join()
+
+        if errors:
+            raise errors[0]
+
+def load_llama_cpp_pipeline() -> LlamaCppPipeline:
+    """Download the Q4_K_M GGUF TinyLlama weights and load them with llama.cpp"""
+    from huggingface_hub import hf_hub_download
+    from llama_cpp import Llama
+
+    model_path = hf_hub_download(repo_id=GGUF_REPO_ID, filename=GGUF_FILENAME)
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=512,
+        n_threads=os.cpu_count(),
+        n_batch=256,
+        verbose=False
+    )
+
+    return LlamaCppPipeline(llm)
@@ -1,14 +1,53 @@
 import pandas as pd
 import streamlit as st
-from typing import Dict, List, Tuple
+from typing import Dict, Mapping, Tuple
+from types import MappingProxyType
 import numpy as np
+import os
+import re
+from functools import lru_cache
 
-@st.cache_data
-def load_clean_data():
-    """Load and cache the insurance dataset"""
+DATA_PATH = 'cleaned_insurance_data.csv'
+PARQUET_PATH = os.path.splitext(DATA_PATH)[0] + '.parquet'
+
+def _apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Compact dtypes for the insurance frame, applied after every read"""
+    # Low-cardinality columns as categories so filters and group-bys work on integer codes.
+    # Region stays numeric: Parquet round-trips a float category back as float64
+    for column in ('Policy_Type', 'Health'):
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    df['Age'] = df['Age'].astype('int16')
+    df['Coverage_Lakhs'] = df['Coverage_Lakhs'].astype('int32')
+    df['Premium_INR'] = df['Premium_INR'].astype('int32')
+    return df
+
+@st.cache_data(persist="disk", max_entries=4, show_spinner=False)
+def _read_clean_data(data_mtime: float) -> pd.DataFrame:
+    """Read the dataset for one CSV modification time, preferring the Parquet copy.
+
+    Errors propagate so that st.cache_data never stores a failed load.
+    """
+    # The CSV is parsed only when the Parquet copy is missing or older than it
+    if os.path.exists(PARQUET_PATH) and (data_mtime is None or os.path.getmtime(PARQUET_PATH) >= data_mtime):
+        return _apply_dtypes(pd.read_parquet(PARQUET_PATH))
+    
+    df = pd.read_csv(DATA_PATH)
+    
     try:
-        df = pd.read_csv('cleaned_insurance_data.csv')
-        return df
+        df.to_parquet(PARQUET_PATH, compression='zstd')
+    except Exception:
+        # Without a Parquet engine the frame is still served, just not persisted
+        pass
+    
+    return _apply_dtypes(df)
+
+def load_clean_data(data_mtime: float = None) -> pd.DataFrame:
+    """Load and cache the insurance dataset, re-reading it whenever the CSV changes"""
+    try:
+        if data_mtime is None and os.path.exists(DATA_PATH):
+            data_mtime = os.path.getmtime(DATA_PATH)
+        return _read_clean_data(data_mtime)
     except FileNotFoundError:
         st.error("❌ Insurance data file not found. Please ensure 'cleaned_insurance_data.csv' exists.")
         return pd.DataFrame()
@@ -16,6 +55,110 @@ def load_clean_data():
         st.error(f"❌ Error loading data: {str(e)}")
         return pd.DataFrame()
 
+@st.cache_resource(show_spinner=False)
+def prepare_index(df: pd.DataFrame) -> Dict:
+    """NumPy views of the policy columns and their coverage/premium ranking, built once per frame"""
+    policy_type = df['Policy_Type'].astype('category')
+    
+    return {
+        'age': df['Age'].to_numpy(),
+        'ptype_codes': policy_type.cat.codes.to_numpy(),
+        'ptype_categories': list(policy_type.cat.categories),
+        'type_code': {name: code for code, name in enumerate(policy_type.cat.categories)},
+        'coverage': df['Coverage_Lakhs'].to_numpy(),
+        'premium': df['Premium_INR'].to_numpy(),
+        # Highest coverage first, lower premium breaking ties; lexsort is stable like sort_values
+        'order_by_cov_prem': np.lexsort((df['Premium_INR'].to_numpy(), -df['Coverage_Lakhs'].to_numpy()))
+    }
+
+def policy_type_codes(index: Dict, policy_types) -> np.ndarray:
+    """Category codes of the given policy type names in a prepare_index() result"""
+    return np.array([index['type_code'][name] for name in policy_types if name in index['type_code']], dtype=int)
+
+@st.cache_resource(show_spinner=False)
+def top_policies_index(df: pd.DataFrame, k: int = 3) -> Dict:
+    """Top-k policy records and row counts per (age, policy type), built once per frame.
+
+    Records are kept with their rank in the prepare_index() coverage/premium ordering,
+    so leaders from several buckets merge back into that same order.
+    """
+    order = prepare_index(df)['order_by_cov_prem']
+    ranked = df.iloc[order]
+    keys = zip(ranked['Age'].tolist(), ranked['Policy_Type'].astype(str).tolist())
+    
+    buckets = {}
+    for rank, (key, record) in enumerate(zip(keys, ranked.to_dict('records'))):
+        count, leaders = buckets.setdefault(key, [0, []])
+        buckets[key][0] = count + 1
+        if len(leaders) < k:
+            leaders.append((rank, record))
+    
+    return buckets
+
+def recommend_kernel(age, coverage, premium, mask, user_age, k):
+    """Positions of the k best rows in mask: lowest premium, then closest age, then highest coverage.
+
+    Scans the arrays once and keeps the leaders in a small insertion-sorted buffer;
+    earlier rows win full ties, matching a stable sort. Each leader's age distance is
+    kept beside it in top_diff, so every row's distance is computed exactly once.
+    """
+    top = np.empty(k, dtype=np.int64)
+    top_diff = np.empty(k, dtype=np.int64)
+    n_top = 0
+    
+    for i in range(age.shape[0]):
+        if not mask[i]:
+            continue
+        
+        age_diff = abs(age[i] - user_age)
+        pos = n_top
+        while pos > 0:
+            j = top[pos - 1]
+            if premium[i] != premium[j]:
+                better = premium[i] < premium[j]
+            elif age_diff != top_diff[pos - 1]:
+                better = age_diff < top_diff[pos - 1]
+            else:
+                better = coverage[i] > coverage[j]
+            if not better:
+                break
+            pos -= 1
+        
+        if pos >= k:
+            continue
+        for j in range(min(n_top, k - 1), pos, -1):
+            top[j] = top[j - 1]
+            top_diff[j] = top_diff[j - 1]
+        top[pos] = i
+        top_diff[pos] = age_diff
+        n_top = min(n_top + 1, k)
+    
+    return top[:n_top]
+
+@lru_cache(maxsize=None)
+def _recommend_kernel_jit():
+    """The numba-compiled recommend_kernel(), or None without numba.
+
+    numba is imported on the first ranking rather than at startup; the kernel compiles
+    on first use and is cached on disk, so later processes skip the compile.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        # Without numba, ranking falls back to a NumPy lexsort
+        return None
+    return njit(cache=True)(recommend_kernel)
+
+def top_k_policies(index: Dict, mask: np.ndarray, user_age: int, k: int = 5) -> np.ndarray:
+    """Row positions of the k best policies in mask, using the numba kernel when available"""
+    kernel = _recommend_kernel_jit()
+    if kernel is not None:
+        return kernel(index['age'], index['coverage'], index['premium'], mask, user_age, k)
+    
+    idx = np.flatnonzero(mask)
+    order = np.lexsort((-index['coverage'][idx], np.abs(index['age'][idx] - user_age), index['premium'][idx]))
+    return idx[order[:k]]
+
 def validate_user_input(age: int, income: float, health: str, goal: str) -> Tuple[bool, str]:
     """Validate user input parameters"""
     if age < 18 or age > 100:
@@ -35,33 +178,43 @@ def validate_user_input(age: int, income: float, health: str, goal: str) -> Tupl
     
     return True, "Valid input"
 
-def calculate_risk_score(age: int, health: str, income: float) -> float:
-    """Calculate risk score based on user profile"""
-    risk_score = 0.0
+# Risk score bands: a value equal to a bin edge falls into the band above it
+AGE_BINS = np.array([25, 35, 50])
+AGE_FACTORS = np.array([1.0, 1.5, 2.0, 3.0])
+INC_BINS = np.array([5, 15])
+INC_MULT = np.array([1.3, 1.1, 0.9])
+HEALTH_LEVELS = ('Good', 'Average', 'Poor')
+HEALTH_MULT = np.array([1.0, 1.5, 2.5])
+
+def calculate_risk_score(age, health, income):
+    """Calculate risk score based on user profile.
+
+    Accepts scalars or equal-length arrays/Series; array input returns a NumPy array.
+    """
+    scalar = np.ndim(age) == 0 and np.ndim(income) == 0 and np.ndim(health) == 0
+    age = np.asarray(age)
+    income = np.asarray(income)
     
     # Age factor
-    if age < 25:
-        risk_score += 1.0
-    elif age < 35:
-        risk_score += 1.5
-    elif age < 50:
-        risk_score += 2.0
-    else:
-        risk_score += 3.0
+    age_factor = AGE_FACTORS[np.searchsorted(AGE_BINS, age, side='right')]
     
-    # Health factor
-    health_multiplier = {"Good": 1.0, "Average": 1.5, "Poor": 2.5}
-    risk_score *= health_multiplier.get(health, 1.0)
+    # Health factor, with unknown health values (code -1) left neutral
+    health_codes = pd.Categorical(np.atleast_1d(health), categories=HEALTH_LEVELS).codes
+    health_factor = np.where(health_codes >= 0, HEALTH_MULT[health_codes], 1.0)
     
     # Income factor (lower income = higher risk)
-    if income < 5:
-        risk_score *= 1.3
-    elif income < 15:
-        risk_score *= 1.1
-    else:
-        risk_score *= 0.9
+    income_factor = INC_MULT[np.searchsorted(INC_BINS, income, side='right')]
     
-    return round(risk_score, 2)
+    # Round through '%.2f' to match round(): np.round scales by 100 first and turns 2.925 into 2.92
+    risk_score = np.char.mod('%.2f', age_factor * health_factor * income_factor).astype(float)
+    return risk_score.item() if scalar else risk_score
+
+# Goal keywords checked in order; only the first matching rule narrows the candidates
+GOAL_RULES = [
+    (re.compile(r'family|dependent'), ('coverage_min', 15)),
+    (re.compile(r'critical|serious'), ('types', ('Health', 'Comprehensive'))),
+    (re.compile(r'save|investment'), ('types', ('Term Life', 'Comprehensive')))
+]
 
 def get_policy_recommendations_enhanced(age: int, income: float, health: str, goal: str) -> Dict:
     """Enhanced recommendation algorithm with multiple factors"""
@@ -71,56 +224,51 @@ def get_policy_recommendations_enhanced(age: int, income: float, health: str, go
         return {"error": "Unable to load insurance data"}
     
     # Calculate risk score
-    risk_score = calculate_risk_score(age, income, health)
+    risk_score = calculate_risk_score(age, health, income)
     
-    # Filter policies based on age range and coverage
-    age_filtered = df[
-        (df['Age'] >= age - 10) & 
-        (df['Age'] <= age + 10) & 
-        (df['Coverage_Lakhs'] >= 10)
-    ].copy()
+    # Filter policies based on age range and coverage, as masks over the cached column arrays
+    index = prepare_index(df)
+    ages, coverage = index['age'], index['coverage']
     
-    if age_filtered.empty:
+    mask = (ages >= age - 10) & (ages <= age + 10) & (coverage >= 10)
+    
+    if not mask.any():
         # Fallback to broader age range
-        age_filtered = df[df['Coverage_Lakhs'] >= 10].copy()
+        mask = coverage >= 10
     
     # Health-based filtering
     if health.lower() == 'poor':
         health_policies = ['Health', 'Comprehensive']
-        age_filtered = age_filtered[age_filtered['Policy_Type'].isin(health_policies)]
+        mask &= np.isin(index['ptype_codes'], policy_type_codes(index, health_policies))
     
     # Goal-based recommendations
     goal_lower = goal.lower()
-    if 'family' in goal_lower or 'dependent' in goal_lower:
-        age_filtered = age_filtered[age_filtered['Coverage_Lakhs'] >= 15]
-    elif 'critical' in goal_lower or 'serious' in goal_lower:
-        preferred_types = ['Health', 'Comprehensive']
-        age_filtered = age_filtered[age_filtered['Policy_Type'].isin(preferred_types)]
-    elif 'save' in goal_lower or 'investment' in goal_lower:
-        preferred_types = ['Term Life', 'Comprehensive']
-        age_filtered = age_filtered[age_filtered['Policy_Type'].isin(preferred_types)]
-    
-    if age_filtered.empty:
-        return {"error": "No suitable policies found for your profile. Please consult with an insurance advisor."}
-    
-    # Sort by multiple factors
-    age_filtered['age_diff'] = abs(age_filtered['Age'] - age)
-    age_filtered['affordability_score'] = age_filtered['Premium_INR'] / (income * 1000) * 12  # Monthly premium as % of income
+    for pattern, (rule, value) in GOAL_RULES:
+        if pattern.search(goal_lower):
+            if rule == 'coverage_min':
+                mask &= coverage >= value
+            else:
+                mask &= np.isin(index['ptype_codes'], policy_type_codes(index, value))
+            break
     
-    # Prioritize affordable and age-appropriate policies
-    recommended = age_filtered.sort_values(['affordability_score', 'age_diff', 'Coverage_Lakhs'], 
-                                         ascending=[True, True, False])
+    total_available = int(np.count_nonzero(mask))
+    if total_available == 0:
+        return {"error": "No suitable policies found for your profile. Please consult with an insurance advisor."}
     
-    top_policies = recommended.head(5)
-    best_policy = recommended.iloc[0]
+    # Prioritize affordable and age-appropriate policies. Affordability (monthly premium as %
+    # of income) divides every premium by the same income, so it ranks like the premium itself
+    top_policies = df.iloc[top_k_policies(index, mask, age, k=5)]
+    best_policy = top_policies.iloc[0]
     
     return {
         "best_policy": best_policy,
         "top_policies": top_policies,
         "risk_score": risk_score,
-        "total_available": len(age_filtered)
+        "total_available": total_available
     }
 
+# Premiums repeat across the top-5 list, metrics and PDF report, so formatted strings are memoized
+@lru_cache(maxsize=4096)
 def format_currency(amount: float) -> str:
     """Format currency in Indian format"""
     if amount >= 10000000:  # 1 crore
@@ -130,49 +278,54 @@ def format_currency(amount: float) -> str:
     else:
         return f"₹{amount:,.0f}"
 
-def get_faq_categories() -> Dict[str, List[Dict[str, str]]]:
-    """Get categorized FAQ data"""
-    return {
-        "Basic Insurance": [
-            {
-                "question": "What is term insurance?",
-                "answer": "Term insurance provides life coverage for a specific period. It's pure protection with no investment component, making it affordable for high coverage amounts."
-            },
-            {
-                "question": "What is health insurance?",
-                "answer": "Health insurance covers medical expenses including hospitalization, surgery, and treatments. It protects you from high healthcare costs in India."
-            },
-            {
-                "question": "What is comprehensive insurance?",
-                "answer": "Comprehensive insurance combines multiple coverages like life, health, and accident protection in one policy, offering complete family protection."
-            }
-        ],
-        "Policy Selection": [
-            {
-                "question": "How much coverage do I need?",
-                "answer": "Generally, life coverage should be 10-15 times your annual income. For health insurance, start with ₹5-10 lakhs and increase based on family size and medical history."
-            },
-            {
-                "question": "When should I buy insurance?",
-                "answer": "Buy insurance as early as possible. Premiums are lower when you're young and healthy. Don't wait for life events like marriage or having children."
-            },
-            {
-                "question": "What factors affect premium?",
-                "answer": "Age, health status, lifestyle habits, coverage amount, policy type, and family medical history are key factors that determine your insurance premium."
-            }
-        ],
-        "Claims & Benefits": [
-            {
-                "question": "How to claim insurance?",
-                "answer": "Contact your insurer immediately, submit required documents (medical bills, discharge summary, claim form), and follow up regularly. Most claims are processed within 30 days."
-            },
-            {
-                "question": "What is waiting period?",
-                "answer": "Waiting period is the time you must wait before claiming certain benefits. It's typically 30 days for accidents and 2-4 years for pre-existing diseases."
-            },
-            {
-                "question": "Can I have multiple policies?",
-                "answer": "Yes, you can have multiple life insurance policies. For health insurance, you can claim from multiple policies but total claim cannot exceed actual expenses."
-            }
-        ]
-    }
+def format_currency_vec(amounts) -> np.ndarray:
+    """Vectorized format_currency() for whole arrays or Series, with identical output"""
+    a = np.asarray(amounts, dtype=float)
+    crores = np.char.add(np.char.add('₹', np.char.mod('%.1f', a / 10000000)), 'Cr')
+    lakhs = np.char.add(np.char.add('₹', np.char.mod('%.1f', a / 100000)), 'L')
+    
+    # %-formatting has no ',' flag, so thousands groups are zero-padded, joined, then the leading zeros stripped
+    rounded = np.round(a)
+    digits = np.abs(rounded).astype(np.int64)
+    grouped = np.char.mod('%03d', digits % 1000)
+    rest = digits // 1000
+    while np.any(rest > 0):
+        grouped = np.where(rest > 0, np.char.add(np.char.add(np.char.mod('%03d', rest % 1000), ','), grouped), grouped)
+        rest //= 1000
+    grouped = np.char.lstrip(grouped, '0')
+    grouped = np.where(grouped == '', '0', grouped)
+    rupees = np.char.add(np.char.add('₹', np.where(np.signbit(rounded), '-', '')), grouped)
+    
+    return np.select([a >= 10000000, a >= 100000], [crores, lakhs], rupees)
+
+# Module-level and read-only so every call shares one FAQ table instead of rebuilding it
+_FAQ_CATEGORIES: Mapping[str, Tuple[Tuple[str, str], ...]] = MappingProxyType({
+    "Basic Insurance": (
+        ("What is term insurance?",
+         "Term insurance provides life coverage for a specific period. It's pure protection with no investment component, making it affordable for high coverage amounts."),
+        ("What is health insurance?",
+         "Health insurance covers medical expenses including hospitalization, surgery, and treatments. It protects you from high healthcare costs in India."),
+        ("What is comprehensive insurance?",
+         "Comprehensive insurance combines multiple coverages like life, health, and accident protection in one policy, offering complete family protection."),
+    ),
+    "Policy Selection": (
+        ("How much coverage do I need?",
+         "Generally, life coverage should be 10-15 times your annual income. For health insurance, start with ₹5-10 lakhs and increase based on family size and medical history."),
+        ("When should I buy insurance?",
+         "Buy insurance as early as possible. Premiums are lower when you're young and healthy. Don't wait for life events like marriage or having children."),
+        ("What factors affect premium?",
+         "Age, health status, lifestyle habits, coverage amount, policy type, and family medical history are key factors that determine your insurance premium."),
+    ),
+    "Claims & Benefits": (
+        ("How to claim insurance?",
+         "Contact your insurer immediately, submit required documents (medical bills, discharge summary, claim form), and follow up regularly. Most claims are processed within 30 days."),
+        ("What is waiting period?",
+         "Waiting period is the time you must wait before claiming certain benefits. It's typically 30 days for accidents and 2-4 years for pre-existing diseases."),
+        ("Can I have multiple policies?",
+         "Yes, you can have multiple life insurance policies. For health insurance, you can claim from multiple policies but total claim cannot exceed actual expenses."),
+    )
+})
+
+def get_faq_categories() -> Mapping[str, Tuple[Tuple[str, str], ...]]:
+    """Get categorized FAQ data as (question, answer) pairs"""
+    return _FAQ_CATEGORIES